@@ -3,52 +3,146 @@ import streamlit as st
 import re
 import math
 from collections import Counter
+from dataclasses import dataclass
 from difflib import SequenceMatcher
 from datetime import datetime
+from functools import cached_property
+from itertools import repeat
+from operator import mul
+
+try:
+    import numpy as np
+except ImportError:  # NumPy only accelerates very long inputs
+    np = None
+
+_TOKEN_RE = re.compile(r'\b\w+\b')
+_SENT_RE = re.compile(r'[.!?]+')
+# Maps every ASCII character that is not a word character to a space, so
+# lower() + translate() + split() tokenizes ASCII text exactly like _TOKEN_RE
+_ASCII_NONWORD = str.maketrans({c: ' ' for c in map(chr, range(128)) if not (c.isalnum() or c == '_')})
+# Texts with at least this many tokens keep their n-grams as hashed NumPy arrays, not tuple sets
+_NGRAM_HASH_MIN_TOKENS = 10000
 
 # ============== PLAGIARISM DETECTION FUNCTIONS ==============
 
 def tokenize_text(text):
     """Tokenize text into words"""
-    return re.findall(r'\b\w+\b', text.lower())
+    text = text.lower()
+    if text.isascii():
+        return text.translate(_ASCII_NONWORD).split()
+    return _TOKEN_RE.findall(text)
 
 def get_sentences(text):
     """Split text into sentences"""
-    sentences = re.split(r'[.!?]+', text)
+    sentences = _SENT_RE.split(text)
     return [s.strip() for s in sentences if s.strip()]
 
 def get_ngrams(tokens, n=3):
     """Generate n-grams from tokens"""
-    return [tuple(tokens[i:i+n]) for i in range(len(tokens)-n+1)]
+    return list(get_ngrams_iter(tokens, n))
 
-def cosine_similarity(text1, text2):
-    """Calculate cosine similarity"""
-    tokens1 = tokenize_text(text1)
-    tokens2 = tokenize_text(text2)
-    
-    vocab = set(tokens1 + tokens2)
-    vec1 = [tokens1.count(word) for word in vocab]
-    vec2 = [tokens2.count(word) for word in vocab]
+def get_ngrams_iter(tokens, n=3):
+    """Lazily yield n-grams from tokens without building a list"""
+    if n == 3:
+        # Trigrams back the n-gram metric, so unroll the common case
+        return zip(tokens, tokens[1:], tokens[2:])
+    return zip(*(tokens[i:] for i in range(n)))
+
+@dataclass
+class TokenProfile:
+    """Tokenized text plus the structures shared by the similarity metrics"""
+    text: str  # raw characters, diffed by the character-level sequence metric
+    tokens: list
+    counts: Counter
+    vocab: set
+    magnitude: float
     
-    dot_product = sum(a*b for a, b in zip(vec1, vec2))
-    mag1 = math.sqrt(sum(a*a for a in vec1))
-    mag2 = math.sqrt(sum(b*b for b in vec2))
+    @cached_property
+    def ngrams(self):
+        """Trigrams, built on first use so a cached profile carries them too"""
+        return _ngram_set(self.tokens)
+
+def build_profile(text):
+    """Tokenize text once and precompute its counts, vocabulary and magnitude"""
+    tokens = tokenize_text(text)
+    counts = Counter(tokens)
+    return TokenProfile(
+        text=text,
+        tokens=tokens,
+        counts=counts,
+        vocab=set(counts),
+        magnitude=math.sqrt(sum(v*v for v in counts.values()))
+    )
+
+def _cosine_from_profiles(profile1, profile2):
+    """Calculate cosine similarity from token profiles"""
+    counts1 = profile1.counts
+    counts2 = profile2.counts
+    if len(counts2) < len(counts1):
+        counts1, counts2 = counts2, counts1
     
-    if mag1 == 0 or mag2 == 0:
+    if profile1.magnitude == 0 or profile2.magnitude == 0:
         return 0.0
-    return dot_product / (mag1 * mag2)
+    # map() over C-level dict.get avoids a Python generator frame per word
+    dot_product = sum(map(mul, counts1.values(), map(counts2.get, counts1, repeat(0))))
+    return dot_product / (profile1.magnitude * profile2.magnitude)
 
-def jaccard_similarity(text1, text2):
-    """Calculate Jaccard similarity"""
-    tokens1 = set(tokenize_text(text1))
-    tokens2 = set(tokenize_text(text2))
+def _jaccard_from_profiles(profile1, profile2):
+    """Calculate Jaccard similarity from token profiles"""
+    # |A ∪ B| = |A| + |B| - |A ∩ B|, so the union set never needs building
+    intersection = len(profile1.vocab & profile2.vocab)
+    union = len(profile1.vocab) + len(profile2.vocab) - intersection
     
-    intersection = tokens1.intersection(tokens2)
-    union = tokens1.union(tokens2)
+    if union == 0:
+        return 0.0
+    return intersection / union
+
+def _hashed_ngrams(tokens, n=3):
+    """Unique 64-bit rolling hashes of the n-grams in tokens"""
+    count = len(tokens) - n + 1
+    if count <= 0:
+        return np.empty(0, dtype=np.uint64)
+    token_hashes = np.fromiter((hash(t) & 0xFFFFFFFFFFFFFFFF for t in tokens),
+                               dtype=np.uint64, count=len(tokens))
+    hashes = np.zeros(count, dtype=np.uint64)
+    for i in range(n):
+        hashes = hashes * np.uint64(1000003) ^ token_hashes[i:i + count]
+    return np.unique(hashes)
+
+def _ngram_set(tokens, n=3):
+    """N-grams as a tuple set, or as hashed NumPy uniques for long token lists"""
+    if np is not None and len(tokens) >= _NGRAM_HASH_MIN_TOKENS:
+        return _hashed_ngrams(tokens, n)
+    return set(get_ngrams_iter(tokens, n))
+
+def _ngram_from_profiles(profile1, profile2, n=3):
+    """Calculate n-gram similarity from token profiles"""
+    if n == 3:
+        ngrams1, ngrams2 = profile1.ngrams, profile2.ngrams
+    else:
+        ngrams1 = _ngram_set(profile1.tokens, n)
+        ngrams2 = _ngram_set(profile2.tokens, n)
+    # A long text keeps hashes and a short one tuples; hash the short side to compare
+    if isinstance(ngrams1, set) and not isinstance(ngrams2, set):
+        ngrams1 = _hashed_ngrams(profile1.tokens, n)
+    elif isinstance(ngrams2, set) and not isinstance(ngrams1, set):
+        ngrams2 = _hashed_ngrams(profile2.tokens, n)
     
-    if len(union) == 0:
+    if len(ngrams1) == 0:
         return 0.0
-    return len(intersection) / len(union)
+    if isinstance(ngrams1, set):
+        overlap = len(ngrams1.intersection(ngrams2))
+    else:
+        overlap = np.intersect1d(ngrams1, ngrams2, assume_unique=True).size
+    return overlap / len(ngrams1)
+
+def cosine_similarity(text1, text2):
+    """Calculate cosine similarity"""
+    return _cosine_from_profiles(build_profile(text1), build_profile(text2))
+
+def jaccard_similarity(text1, text2):
+    """Calculate Jaccard similarity"""
+    return _jaccard_from_profiles(build_profile(text1), build_profile(text2))
 
 def sequence_similarity(text1, text2):
     """Calculate sequence similarity"""
@@ -56,55 +150,76 @@ def sequence_similarity(text1, text2):
 
 def ngram_similarity(text1, text2, n=3):
     """Calculate n-gram similarity"""
-    tokens1 = tokenize_text(text1)
-    tokens2 = tokenize_text(text2)
-    
-    ngrams1 = set(get_ngrams(tokens1, n))
-    ngrams2 = set(get_ngrams(tokens2, n))
-    
-    if len(ngrams1) == 0:
-        return 0.0
-    overlap = len(ngrams1.intersection(ngrams2))
-    return overlap / len(ngrams1)
+    return _ngram_from_profiles(build_profile(text1), build_profile(text2), n)
 
+@st.cache_data(max_entries=128, show_spinner=False)
 def detect_plagiarism(original_text, submitted_text):
     """Detect plagiarism with multiple algorithms"""
-    cosine = cosine_similarity(original_text, submitted_text)
-    jaccard = jaccard_similarity(original_text, submitted_text)
-    sequence = sequence_similarity(original_text, submitted_text)
-    ngram = ngram_similarity(original_text, submitted_text)
+    return detect_plagiarism_profiles(build_profile(original_text), build_profile(submitted_text))
+
+def detect_plagiarism_profiles(profile1, profile2):
+    """Detect plagiarism between two token profiles"""
+    cosine = _cosine_from_profiles(profile1, profile2)
+    jaccard = _jaccard_from_profiles(profile1, profile2)
+    ngram = _ngram_from_profiles(profile1, profile2)
+    # Weighted score of every metric except sequence similarity
+    partial = cosine * 0.3 + jaccard * 0.2 + ngram * 0.2
     
-    overall = (cosine * 0.3 + jaccard * 0.2 + sequence * 0.3 + ngram * 0.2) * 100
+    matcher = SequenceMatcher(None, profile1.text, profile2.text)
+    sequence = matcher.quick_ratio()
+    # quick_ratio() bounds ratio() from above; when even the bound keeps the result
+    # in the 'low' severity band, skip the full diff and report the bound as such
+    sequence_is_upper_bound = (partial + sequence * 0.3) * 100 <= 40
+    if not sequence_is_upper_bound:
+        # The exact diff is quadratic in the worst case, so long texts that are
+        # actually similar still pay its full cost
+        sequence = matcher.ratio()
+    
+    overall = (partial + sequence * 0.3) * 100
     
     return {
         'overall_similarity': round(overall, 2),
         'cosine_similarity': round(cosine * 100, 2),
         'jaccard_similarity': round(jaccard * 100, 2),
         'sequence_similarity': round(sequence * 100, 2),
+        'sequence_is_upper_bound': sequence_is_upper_bound,
         'ngram_similarity': round(ngram * 100, 2),
         'is_plagiarized': overall > 50,
         'severity': 'critical' if overall > 75 else 'high' if overall > 60 else 'moderate' if overall > 40 else 'low'
     }
 
+def _sentence_stats(sentences):
+    """Compute (perplexity, burstiness) in a single pass over the sentences"""
+    count = 0
+    mean = 0.0
+    m2 = 0.0
+    complexity_total = 0.0
+    complexity_count = 0
+    
+    for sentence in sentences:
+        tokens = tokenize_text(sentence)
+        # Welford's online update of the word count mean and variance
+        count += 1
+        delta = len(tokens) - mean
+        mean += delta / count
+        m2 += delta * (len(tokens) - mean)
+        if tokens:
+            complexity_total += len(set(tokens)) / len(tokens)
+            complexity_count += 1
+    
+    perplexity = (m2 / count) ** 0.5 if count else 0.0
+    if count < 2 or not complexity_count:
+        return perplexity, 0.0
+    return perplexity, complexity_total / complexity_count
+
+@st.cache_data(max_entries=128, show_spinner=False)
 def detect_ai_content(text):
     """Detect AI-generated content"""
     sentences = get_sentences(text)
     if len(sentences) < 2:
         ai_prob = 25.0
     else:
-        word_counts = [len(tokenize_text(s)) for s in sentences]
-        avg = sum(word_counts) / len(word_counts) if word_counts else 0
-        variance = sum((x - avg) ** 2 for x in word_counts) / len(word_counts) if word_counts else 0
-        perplexity = variance ** 0.5 if variance > 0 else 0
-        
-        complexities = []
-        for sentence in sentences:
-            tokens = tokenize_text(sentence)
-            if tokens:
-                unique_ratio = len(set(tokens)) / len(tokens)
-                complexities.append(unique_ratio)
-        
-        burstiness = sum(complexities) / len(complexities) if complexities else 0
+        perplexity, burstiness = _sentence_stats(sentences)
         ai_prob = min(100, max(0, (perplexity * 15 + burstiness * 35)))
     
     return {
@@ -180,6 +295,8 @@ if st.button("🔍 Analyze Now", use_container_width=True):
             # Run analysis
             plag_results = detect_plagiarism(compare_text, submitted_text)
             ai_results = detect_ai_content(submitted_text)
+            # Sequence (and so overall) similarity may be an upper bound rather than exact
+            bound = "≤ " if plag_results['sequence_is_upper_bound'] else ""
             
             # Display results in tabs
             tab1, tab2, tab3, tab4 = st.tabs(["📊 Results", "📈 Metrics", "💭 Suggestions", "📥 Download"])
@@ -191,7 +308,7 @@ if st.button("🔍 Analyze Now", use_container_width=True):
                 with col1:
                     st.metric("Plagiarism Severity", plag_results['severity'].upper())
                 with col2:
-                    st.metric("Similarity %", f"{plag_results['overall_similarity']}%")
+                    st.metric("Similarity %", f"{bound}{plag_results['overall_similarity']}%")
                 with col3:
                     status = "🚨 PLAGIARIZED" if plag_results['is_plagiarized'] else "✅ ORIGINAL"
                     st.markdown(f"<div class='metric-box'>{status}</div>", unsafe_allow_html=True)
@@ -210,7 +327,7 @@ if st.button("🔍 Analyze Now", use_container_width=True):
                 st.subheader("Similarity Metrics")
                 st.write(f"**Cosine Similarity:** {plag_results['cosine_similarity']}%")
                 st.write(f"**Jaccard Similarity:** {plag_results['jaccard_similarity']}%")
-                st.write(f"**Sequence Similarity:** {plag_results['sequence_similarity']}%")
+                st.write(f"**Sequence Similarity:** {bound}{plag_results['sequence_similarity']}%")
                 st.write(f"**N-gram Similarity:** {plag_results['ngram_similarity']}%")
             
             with tab3:
@@ -2,7 +2,27 @@
 import math
 import re
 from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
 from difflib import SequenceMatcher
+from functools import cached_property
+from itertools import repeat
+from operator import mul
+
+try:
+    import numpy as np
+except ImportError:  # NumPy only accelerates very long inputs
+    np = None
+
+_TOKEN_RE = re.compile(r'\b\w+\b')
+_SENT_RE = re.compile(r'[.!?]+')
+_WS_RE = re.compile(r'\s+')
+_PUNCT_RE = re.compile(r'[^\w\s.,!?;:\'-]')
+# Maps every ASCII character that is not a word character to a space, so
+# lower() + translate() + split() tokenizes ASCII text exactly like _TOKEN_RE
+_ASCII_NONWORD = str.maketrans({c: ' ' for c in map(chr, range(128)) if not (c.isalnum() or c == '_')})
+# Texts with at least this many tokens keep their n-grams as hashed NumPy arrays, not tuple sets
+_NGRAM_HASH_MIN_TOKENS = 10000
 
 class DocumentParser:
     """Parse and extract text from documents"""
@@ -14,132 +34,241 @@ class TextPreprocessor:
     """Clean and preprocess text"""
     @staticmethod
     def clean_text(text):
-        text = re.sub(r'\s+', ' ', text)
-        text = re.sub(r'[^\w\s.,!?;:\'-]', '', text)
+        text = _WS_RE.sub(' ', text)
+        text = _PUNCT_RE.sub('', text)
         return text.strip()
     
     @staticmethod
     def tokenize(text):
-        return re.findall(r'\b\w+\b', text.lower())
+        text = text.lower()
+        if text.isascii():
+            return text.translate(_ASCII_NONWORD).split()
+        return _TOKEN_RE.findall(text)
     
     @staticmethod
     def get_sentences(text):
-        sentences = re.split(r'[.!?]+', text)
+        sentences = _SENT_RE.split(text)
         return [s.strip() for s in sentences if s.strip()]
     
     @staticmethod
     def get_ngrams(tokens, n=3):
-        return [tuple(tokens[i:i+n]) for i in range(len(tokens)-n+1)]
+        return list(TextPreprocessor.get_ngrams_iter(tokens, n))
+    
+    @staticmethod
+    def get_ngrams_iter(tokens, n=3):
+        """Lazily yield n-grams from tokens without building a list"""
+        if n == 3:
+            # Trigrams back the n-gram metric, so unroll the common case
+            return zip(tokens, tokens[1:], tokens[2:])
+        return zip(*(tokens[i:] for i in range(n)))
+
+@dataclass
+class TokenProfile:
+    """Tokenized text plus the structures shared by the similarity metrics"""
+    text: str  # raw characters, diffed by the character-level sequence metric
+    tokens: list
+    counts: Counter
+    vocab: set
+    magnitude: float
+    
+    @cached_property
+    def ngrams(self):
+        """Trigrams, built on first use so a cached profile carries them too"""
+        return PlagiarismDetector._ngram_set(self.tokens)
+
+def build_profile(text):
+    """Tokenize text once and precompute its counts, vocabulary and magnitude"""
+    tokens = TextPreprocessor.tokenize(text)
+    counts = Counter(tokens)
+    return TokenProfile(
+        text=text,
+        tokens=tokens,
+        counts=counts,
+        vocab=set(counts),
+        magnitude=math.sqrt(sum(v*v for v in counts.values()))
+    )
 
 class PlagiarismDetector:
     """Core plagiarism detection algorithms"""
     
     @staticmethod
-    def cosine_similarity(text1, text2):
-        tokens1 = TextPreprocessor.tokenize(text1)
-        tokens2 = TextPreprocessor.tokenize(text2)
-        
-        vocab = set(tokens1 + tokens2)
-        vec1 = [tokens1.count(word) for word in vocab]
-        vec2 = [tokens2.count(word) for word in vocab]
+    def _cosine_from_profiles(profile1, profile2):
+        counts1 = profile1.counts
+        counts2 = profile2.counts
+        if len(counts2) < len(counts1):
+            counts1, counts2 = counts2, counts1
         
-        dot_product = sum(a*b for a, b in zip(vec1, vec2))
-        mag1 = math.sqrt(sum(a*a for a in vec1))
-        mag2 = math.sqrt(sum(b*b for b in vec2))
-        
-        if mag1 == 0 or mag2 == 0:
+        if profile1.magnitude == 0 or profile2.magnitude == 0:
             return 0.0
-        return dot_product / (mag1 * mag2)
+        # map() over C-level dict.get avoids a Python generator frame per word
+        dot_product = sum(map(mul, counts1.values(), map(counts2.get, counts1, repeat(0))))
+        return dot_product / (profile1.magnitude * profile2.magnitude)
     
     @staticmethod
-    def jaccard_similarity(text1, text2):
-        tokens1 = set(TextPreprocessor.tokenize(text1))
-        tokens2 = set(TextPreprocessor.tokenize(text2))
+    def _jaccard_from_profiles(profile1, profile2):
+        # |A ∪ B| = |A| + |B| - |A ∩ B|, so the union set never needs building
+        intersection = len(profile1.vocab & profile2.vocab)
+        union = len(profile1.vocab) + len(profile2.vocab) - intersection
         
-        intersection = tokens1.intersection(tokens2)
-        union = tokens1.union(tokens2)
-        
-        if len(union) == 0:
+        if union == 0:
             return 0.0
-        return len(intersection) / len(union)
+        return intersection / union
     
     @staticmethod
-    def sequence_similarity(text1, text2):
-        return SequenceMatcher(None, text1, text2).ratio()
+    def _hashed_ngrams(tokens, n=3):
+        """Unique 64-bit rolling hashes of the n-grams in tokens"""
+        count = len(tokens) - n + 1
+        if count <= 0:
+            return np.empty(0, dtype=np.uint64)
+        token_hashes = np.fromiter((hash(t) & 0xFFFFFFFFFFFFFFFF for t in tokens),
+                                   dtype=np.uint64, count=len(tokens))
+        hashes = np.zeros(count, dtype=np.uint64)
+        for i in range(n):
+            hashes = hashes * np.uint64(1000003) ^ token_hashes[i:i + count]
+        return np.unique(hashes)
     
     @staticmethod
-    def ngram_similarity(text1, text2, n=3):
-        tokens1 = TextPreprocessor.tokenize(text1)
-        tokens2 = TextPreprocessor.tokenize(text2)
-        
-        ngrams1 = set(TextPreprocessor.get_ngrams(tokens1, n))
-        ngrams2 = set(TextPreprocessor.get_ngrams(tokens2, n))
+    def _ngram_set(tokens, n=3):
+        """N-grams as a tuple set, or as hashed NumPy uniques for long token lists"""
+        if np is not None and len(tokens) >= _NGRAM_HASH_MIN_TOKENS:
+            return PlagiarismDetector._hashed_ngrams(tokens, n)
+        return set(TextPreprocessor.get_ngrams_iter(tokens, n))
+    
+    @staticmethod
+    def _ngram_from_profiles(profile1, profile2, n=3):
+        if n == 3:
+            ngrams1, ngrams2 = profile1.ngrams, profile2.ngrams
+        else:
+            ngrams1 = PlagiarismDetector._ngram_set(profile1.tokens, n)
+            ngrams2 = PlagiarismDetector._ngram_set(profile2.tokens, n)
+        # A long text keeps hashes and a short one tuples; hash the short side to compare
+        if isinstance(ngrams1, set) and not isinstance(ngrams2, set):
+            ngrams1 = PlagiarismDetector._hashed_ngrams(profile1.tokens, n)
+        elif isinstance(ngrams2, set) and not isinstance(ngrams1, set):
+            ngrams2 = PlagiarismDetector._hashed_ngrams(profile2.tokens, n)
         
         if len(ngrams1) == 0:
             return 0.0
-        overlap = len(ngrams1.intersection(ngrams2))
+        if isinstance(ngrams1, set):
+            overlap = len(ngrams1.intersection(ngrams2))
+        else:
+            overlap = np.intersect1d(ngrams1, ngrams2, assume_unique=True).size
         return overlap / len(ngrams1)
     
+    @staticmethod
+    def cosine_similarity(text1, text2):
+        return PlagiarismDetector._cosine_from_profiles(build_profile(text1), build_profile(text2))
+    
+    @staticmethod
+    def jaccard_similarity(text1, text2):
+        return PlagiarismDetector._jaccard_from_profiles(build_profile(text1), build_profile(text2))
+    
+    @staticmethod
+    def sequence_similarity(text1, text2):
+        return SequenceMatcher(None, text1, text2).ratio()
+    
+    @staticmethod
+    def ngram_similarity(text1, text2, n=3):
+        return PlagiarismDetector._ngram_from_profiles(build_profile(text1), build_profile(text2), n)
+    
     @staticmethod
     def detect_plagiarism(original_text, submitted_text):
         """Comprehensive plagiarism detection"""
-        cosine = PlagiarismDetector.cosine_similarity(original_text, submitted_text)
-        jaccard = PlagiarismDetector.jaccard_similarity(original_text, submitted_text)
-        sequence = PlagiarismDetector.sequence_similarity(original_text, submitted_text)
-        ngram = PlagiarismDetector.ngram_similarity(original_text, submitted_text)
+        return PlagiarismDetector.detect_plagiarism_profiles(
+            build_profile(original_text), build_profile(submitted_text))
+    
+    @staticmethod
+    def detect_plagiarism_profiles(profile1, profile2):
+        """Plagiarism detection on TokenProfiles from build_profile()"""
+        matcher = SequenceMatcher(None, profile1.text, profile2.text)
+        return PlagiarismDetector._plagiarism_report(profile1, profile2, matcher)
+    
+    @staticmethod
+    def _plagiarism_report(profile1, profile2, matcher):
+        cosine = PlagiarismDetector._cosine_from_profiles(profile1, profile2)
+        jaccard = PlagiarismDetector._jaccard_from_profiles(profile1, profile2)
+        ngram = PlagiarismDetector._ngram_from_profiles(profile1, profile2)
+        # Weighted score of every metric except sequence similarity
+        partial = cosine * 0.3 + jaccard * 0.2 + ngram * 0.2
         
-        overall = (cosine * 0.3 + jaccard * 0.2 + sequence * 0.3 + ngram * 0.2) * 100
+        sequence = matcher.quick_ratio()
+        # quick_ratio() bounds ratio() from above; when even the bound keeps the result
+        # in the 'low' severity band, skip the full diff and report the bound as such
+        sequence_is_upper_bound = (partial + sequence * 0.3) * 100 <= 40
+        if not sequence_is_upper_bound:
+            # The exact diff is quadratic in the worst case, so long texts that are
+            # actually similar still pay its full cost
+            sequence = matcher.ratio()
+        
+        overall = (partial + sequence * 0.3) * 100
         
         return {
             'overall_similarity': round(overall, 2),
             'cosine_similarity': round(cosine * 100, 2),
             'jaccard_similarity': round(jaccard * 100, 2),
             'sequence_similarity': round(sequence * 100, 2),
+            'sequence_is_upper_bound': sequence_is_upper_bound,
             'ngram_similarity': round(ngram * 100, 2),
             'is_plagiarized': overall > 50,
             'severity': 'critical' if overall > 75 else 'high' if overall > 60 else 'moderate' if overall > 40 else 'low'
         }
-
-class AIContentDetector:
-    """Detect AI-generated content"""
     
     @staticmethod
-    def calculate_perplexity_score(text):
-        sentences = TextPreprocessor.get_sentences(text)
-        if not sentences:
-            return 0.0
+    def detect_plagiarism_batch(submitted_text, source_texts):
+        """Compare one submission against many sources, profiling it only once"""
+        submitted = build_profile(submitted_text)
+        # SequenceMatcher caches its analysis of the second sequence, so the
+        # submission goes there once and only the first sequence changes per source
+        matcher = SequenceMatcher()
+        matcher.set_seq2(submitted.text)
         
-        word_counts = [len(TextPreprocessor.tokenize(s)) for s in sentences]
-        if not word_counts:
-            return 0.0
-        
-        avg = sum(word_counts) / len(word_counts)
-        variance = sum((x - avg) ** 2 for x in word_counts) / len(word_counts)
-        return variance ** 0.5
+        results = []
+        for source_text in source_texts:
+            source = build_profile(source_text)
+            matcher.set_seq1(source.text)
+            results.append(PlagiarismDetector._plagiarism_report(source, submitted, matcher))
+        return results
+
+class AIContentDetector:
+    """Detect AI-generated content"""
     
     @staticmethod
-    def calculate_burstiness(text):
-        sentences = TextPreprocessor.get_sentences(text)
-        if len(sentences) < 2:
-            return 0.0
+    def _sentence_stats(sentences):
+        """Compute (perplexity, burstiness) in a single pass over the sentences"""
+        count = 0
+        mean = 0.0
+        m2 = 0.0
+        complexity_total = 0.0
+        complexity_count = 0
         
-        complexities = []
         for sentence in sentences:
             tokens = TextPreprocessor.tokenize(sentence)
+            # Welford's online update of the word count mean and variance
+            count += 1
+            delta = len(tokens) - mean
+            mean += delta / count
+            m2 += delta * (len(tokens) - mean)
             if tokens:
-                unique_ratio = len(set(tokens)) / len(tokens)
-                complexities.append(unique_ratio)
+                complexity_total += len(set(tokens)) / len(tokens)
+                complexity_count += 1
         
-        if not complexities:
-            return 0.0
-        avg_complexity = sum(complexities) / len(complexities)
-        return avg_complexity
+        perplexity = (m2 / count) ** 0.5 if count else 0.0
+        if count < 2 or not complexity_count:
+            return perplexity, 0.0
+        return perplexity, complexity_total / complexity_count
+    
+    @staticmethod
+    def calculate_perplexity_score(text):
+        return AIContentDetector._sentence_stats(TextPreprocessor.get_sentences(text))[0]
+    
+    @staticmethod
+    def calculate_burstiness(text):
+        return AIContentDetector._sentence_stats(TextPreprocessor.get_sentences(text))[1]
     
     @staticmethod
     def detect_ai_content(text):
         """Detect AI-generated content"""
-        perplexity = AIContentDetector.calculate_perplexity_score(text)
-        burstiness = AIContentDetector.calculate_burstiness(text)
+        perplexity, burstiness = AIContentDetector._sentence_stats(TextPreprocessor.get_sentences(text))
         
         # Scale to 0-100
         ai_probability = min(100, max(0, (perplexity * 20 + burstiness * 30)))
@@ -165,7 +294,7 @@ def analyze_text(submitted_text, comparison_text=""):
             'success': True,
             'plagiarism_analysis': plagiarism_result,
             'ai_analysis': ai_result,
-            'timestamp': pd.Timestamp.now().isoformat() if 'pd' in dir() else str(__import__('datetime').datetime.now().isoformat())
+            'timestamp': datetime.now().isoformat()
         }
     except Exception as e:
         return {